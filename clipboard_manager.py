@@ -7,10 +7,26 @@ import os
 import sys
 import json
 import time
+import atexit
+import signal
+import hashlib
+import heapq
+import mmap
+import select
 import argparse
+import functools
+from bisect import bisect_left, bisect_right
+from collections import Counter, deque
+from contextlib import contextmanager
+from operator import itemgetter
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+if sys.platform == 'win32':
+    import msvcrt
+else:
+    import fcntl
 
 try:
     import pyperclip
@@ -19,8 +35,304 @@ except ImportError:
     print("Install it with: pip install pyperclip")
     sys.exit(1)
 
+# Optional faster JSON backends; both accept bytes and avoid a decode pass
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    try:
+        import ujson
+    except ImportError:
+        ujson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Optional compression of stored text
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _loads(data: bytes):
+    """Parse a JSON document from bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    if ujson is not None:
+        return ujson.loads(data)
+    return json.loads(data)
+
+
+def _dumps(obj, indent: bool = False) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes, compact unless indent is set."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if ujson is not None:
+        return ujson.dumps(obj, ensure_ascii=False, indent=2 if indent else 0).encode('utf-8')
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _write_temp(path: Path, chunks: Iterable[bytes]) -> Path:
+    """Write chunks to a temp file next to path, fsync it and return its path."""
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp
+
+
+def _atomic_write(path: Path, data: bytes):
+    """Replace path with data so readers see either the old or new file."""
+    os.replace(_write_temp(path, (data,)), path)
+
+
+def _display_time(timestamp: str) -> str:
+    """Format an isoformat() timestamp as 'YYYY-MM-DD HH:MM:SS'."""
+    # The first 19 characters already are the date and time to the second
+    return timestamp[:19].replace('T', ' ')
+
+
+def _content_hash(data: bytes) -> str:
+    """Return the key under which content is stored in the string table."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ClipboardWatcher:
+    """Waits for clipboard changes by sleeping; the portable fallback."""
+    
+    def wait(self, timeout: float) -> bool:
+        """Block up to timeout seconds; return True if the clipboard may have changed."""
+        time.sleep(timeout)
+        return True
+    
+    def paste(self) -> str:
+        """Return the current clipboard text."""
+        return pyperclip.paste()
+    
+    def close(self):
+        """Release any OS resources held by the watcher."""
+        pass
+
+
+class Win32ClipboardWatcher(ClipboardWatcher):
+    """Wakes on WM_CLIPBOARDUPDATE sent to a hidden message-only window."""
+    
+    HWND_MESSAGE = -3
+    QS_ALLINPUT = 0x04FF
+    PM_REMOVE = 0x0001
+    CF_UNICODETEXT = 13
+    
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+        
+        self._ctypes = ctypes
+        self._user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self._user32.CreateWindowExW.restype = wintypes.HWND
+        self._user32.CreateWindowExW.argtypes = [
+            wintypes.DWORD, wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD,
+            ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+            wintypes.HWND, wintypes.HMENU, wintypes.HINSTANCE, wintypes.LPVOID
+        ]
+        self._user32.AddClipboardFormatListener.argtypes = [wintypes.HWND]
+        self._user32.RemoveClipboardFormatListener.argtypes = [wintypes.HWND]
+        self._user32.DestroyWindow.argtypes = [wintypes.HWND]
+        self._user32.PeekMessageW.argtypes = [
+            ctypes.POINTER(wintypes.MSG), wintypes.HWND, wintypes.UINT, wintypes.UINT, wintypes.UINT
+        ]
+        self._user32.GetClipboardSequenceNumber.restype = wintypes.DWORD
+        self._user32.OpenClipboard.argtypes = [wintypes.HWND]
+        self._user32.GetClipboardData.argtypes = [wintypes.UINT]
+        self._user32.GetClipboardData.restype = wintypes.HANDLE
+        self._kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self._kernel32.GlobalLock.argtypes = [wintypes.HGLOBAL]
+        self._kernel32.GlobalLock.restype = wintypes.LPVOID
+        self._kernel32.GlobalUnlock.argtypes = [wintypes.HGLOBAL]
+        
+        self._hwnd = self._user32.CreateWindowExW(
+            0, 'STATIC', None, 0, 0, 0, 0, 0,
+            wintypes.HWND(self.HWND_MESSAGE), None, None, None
+        )
+        if not self._hwnd:
+            raise ctypes.WinError(ctypes.get_last_error())
+        if not self._user32.AddClipboardFormatListener(self._hwnd):
+            error = ctypes.WinError(ctypes.get_last_error())
+            self._user32.DestroyWindow(self._hwnd)
+            raise error
+        
+        self._msg = wintypes.MSG()
+        self._sequence = self._user32.GetClipboardSequenceNumber()
+    
+    def wait(self, timeout: float) -> bool:
+        self._user32.MsgWaitForMultipleObjects(0, None, False, int(timeout * 1000), self.QS_ALLINPUT)
+        # Pumping the queue delivers WM_CLIPBOARDUPDATE; the sequence number
+        # then tells us whether anything was actually copied
+        while self._user32.PeekMessageW(self._ctypes.byref(self._msg), self._hwnd, 0, 0, self.PM_REMOVE):
+            pass
+        sequence = self._user32.GetClipboardSequenceNumber()
+        if sequence != self._sequence:
+            self._sequence = sequence
+            return True
+        return False
+    
+    def paste(self) -> str:
+        # Another application may hold the clipboard open; pyperclip retries
+        if not self._user32.OpenClipboard(self._hwnd):
+            return super().paste()
+        try:
+            handle = self._user32.GetClipboardData(self.CF_UNICODETEXT)
+            if not handle:
+                return ''
+            pointer = self._kernel32.GlobalLock(handle)
+            if not pointer:
+                return ''
+            try:
+                return self._ctypes.wstring_at(pointer)
+            finally:
+                self._kernel32.GlobalUnlock(handle)
+        finally:
+            self._user32.CloseClipboard()
+    
+    def close(self):
+        self._user32.RemoveClipboardFormatListener(self._hwnd)
+        self._user32.DestroyWindow(self._hwnd)
+
+
+class MacClipboardWatcher(ClipboardWatcher):
+    """Polls NSPasteboard.changeCount, an integer read instead of a paste."""
+    
+    def __init__(self):
+        from AppKit import NSPasteboard, NSPasteboardTypeString
+        
+        self._string_type = NSPasteboardTypeString
+        self._pasteboard = NSPasteboard.generalPasteboard()
+        self._change_count = self._pasteboard.changeCount()
+    
+    def wait(self, timeout: float) -> bool:
+        # changeCount is cheap enough to check ten times per interval
+        deadline = time.monotonic() + timeout
+        while True:
+            change_count = self._pasteboard.changeCount()
+            if change_count != self._change_count:
+                self._change_count = change_count
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(timeout / 10, remaining))
+    
+    def paste(self) -> str:
+        text = self._pasteboard.stringForType_(self._string_type)
+        return str(text) if text is not None else ''
+
+
+class X11ClipboardWatcher(ClipboardWatcher):
+    """Blocks on XFixes selection-owner notifications for CLIPBOARD."""
+    
+    PASTE_TIMEOUT = 1.0
+    
+    def __init__(self):
+        from Xlib import X, display
+        from Xlib.ext import xfixes
+        
+        self._X = X
+        self._display = display.Display()
+        if not self._display.has_extension('XFIXES'):
+            self._display.close()
+            raise RuntimeError("XFIXES extension not available")
+        self._display.xfixes_query_version()
+        
+        screen = self._display.screen()
+        self._clipboard = self._display.get_atom('CLIPBOARD')
+        self._utf8_string = self._display.get_atom('UTF8_STRING')
+        self._incr = self._display.get_atom('INCR')
+        self._property = self._display.get_atom('CLIPBOARD_HISTORY_MANAGER')
+        # Unmapped window that receives converted selections
+        self._window = screen.root.create_window(0, 0, 1, 1, 0, screen.root_depth)
+        self._display.xfixes_select_selection_input(
+            screen.root, self._clipboard, xfixes.XFixesSetSelectionOwnerNotifyMask
+        )
+        self._display.flush()
+        # Set when an owner change arrives while paste() waits for its reply
+        self._changed = False
+    
+    def _next_event(self, timeout: float):
+        """Return the next X event, or None if none arrives within timeout."""
+        if not self._display.pending_events():
+            ready, _, _ = select.select([self._display], [], [], timeout)
+            if not ready:
+                return None
+        return self._display.next_event()
+    
+    def wait(self, timeout: float) -> bool:
+        if self._changed:
+            self._changed = False
+            return True
+        if self._next_event(timeout) is None:
+            return False
+        
+        # Drain any further owner changes queued behind the first
+        while self._display.pending_events():
+            self._display.next_event()
+        return True
+    
+    def paste(self) -> str:
+        X = self._X
+        self._window.convert_selection(self._clipboard, self._utf8_string, self._property, X.CurrentTime)
+        self._display.flush()
+        
+        deadline = time.monotonic() + self.PASTE_TIMEOUT
+        while True:
+            event = self._next_event(max(deadline - time.monotonic(), 0))
+            if event is None:
+                # Owner never answered; let pyperclip try instead
+                return super().paste()
+            if event.type == X.SelectionNotify:
+                break
+            self._changed = True
+        
+        if event.property == X.NONE:
+            return ''
+        prop = self._window.get_full_property(self._property, X.AnyPropertyType)
+        self._window.delete_property(self._property)
+        if prop is None:
+            return ''
+        if prop.property_type == self._incr:
+            # Large selections arrive in chunks; not worth handling here
+            return super().paste()
+        return prop.value.decode('utf-8', 'replace')
+    
+    def close(self):
+        self._window.destroy()
+        self._display.close()
+
+
+def create_watcher() -> ClipboardWatcher:
+    """Return the best clipboard watcher available on this platform."""
+    try:
+        if sys.platform == 'win32':
+            return Win32ClipboardWatcher()
+        if sys.platform == 'darwin':
+            return MacClipboardWatcher()
+        if os.environ.get('DISPLAY'):
+            return X11ClipboardWatcher()
+    except Exception:
+        pass
+    return ClipboardWatcher()
+
 
 class ClipboardManager:
+    # New entries are written to disk in batches
+    FLUSH_EVERY = 50
+    FLUSH_INTERVAL = 10.0
+    
     def __init__(self, data_dir: Optional[str] = None, max_size_mb: int = 10):
         if data_dir is None:
             data_dir = Path.home() / '.clipboard_history'
@@ -30,64 +342,489 @@ class ClipboardManager:
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
         
-        self.history_file = self.data_dir / 'clipboard.json'
+        self.history_file = self.data_dir / 'clipboard.jsonl'
+        self.legacy_history_file = self.data_dir / 'clipboard.json'
+        self.contents_file = self.data_dir / 'contents.bin'
         self.config_file = self.data_dir / 'config.json'
+        self.lock_file = self.data_dir / 'contents.lock'
         self.max_size_bytes = max_size_mb * 1024 * 1024
         
-        self.load_data()
+        # New strings and serialized log lines not yet written to disk
+        self._pending_contents = {}
+        self._pending_entries = []
+        self._last_flush = time.monotonic()
+        
+        self._compressor = zstandard.ZstdCompressor(level=3) if zstandard is not None else None
+        self._decompressor = None
+        # Decompressed text of recently displayed strings, keyed by hash
+        self._read_content = functools.lru_cache(maxsize=64)(self._decode_content)
+        
+        # Other processes (a running monitor, one-shot commands) share the
+        # files; appends and rewrites happen while holding the lock file
+        self._lock = None
+        self._lock_depth = 0
+        with self._locked():
+            self.load_data()
+        atexit.register(self._flush)
     
     def load_data(self):
         """Load clipboard history and config."""
-        if self.history_file.exists():
-            with open(self.history_file, 'r', encoding='utf-8') as f:
-                self.history = json.load(f)
-        else:
-            self.history = []
-        
         if self.config_file.exists():
-            with open(self.config_file, 'r') as f:
-                self.config = json.load(f)
+            with open(self.config_file, 'rb') as f:
+                self.config = _loads(f.read())
         else:
             self.config = {
                 'max_entries': 1000,
                 'retention_days': 30
             }
             self.save_config()
+        
+        max_entries = self.config.get('max_entries', 1000)
+        needs_rewrite = False
+        if self.history_file.exists():
+            history = self._read_log(max_entries)
+        elif self.legacy_history_file.exists():
+            # Migrate the old single-document format to the append-only log
+            with open(self.legacy_history_file, 'rb') as f:
+                if ijson is not None:
+                    history = deque(ijson.items(f, 'item', use_float=True), maxlen=max_entries)
+                else:
+                    history = deque(_loads(f.read()), maxlen=max_entries)
+            needs_rewrite = True
+        else:
+            history = deque()
+            self._log_entries = 0
+        
+        # Identical copies share one stored string; entries refer to it by
+        # hash. Strings only referenced by trimmed entries are not loaded.
+        live = {entry['hash'] for entry in history if 'hash' in entry}
+        self._load_contents(live)
+        
+        self.history = []
+        for entry in history:
+            if 'content' in entry:
+                # Entry written before contents were deduplicated
+                content = entry.pop('content')
+                entry['hash'] = _content_hash(content.encode('utf-8'))
+                self._pending_contents.setdefault(entry['hash'], content)
+                needs_rewrite = True
+            # Skip entries whose string was lost to an interrupted compaction
+            if entry['hash'] in self._by_hash or entry['hash'] in self._pending_contents:
+                self.history.append(entry)
+        
+        if needs_rewrite:
+            self.save_data()
+            if self.legacy_history_file.exists():
+                self.legacy_history_file.unlink()
+        
+        # Epoch seconds of each entry, parallel to self.history. Entries are
+        # appended in capture order, but clock corrections, DST fall-back and
+        # migrated files can break the order, so only bisect when it holds.
+        self._ts = [datetime.fromisoformat(e['timestamp']).timestamp() for e in self.history]
+        self._ts_sorted = all(a <= b for a, b in zip(self._ts, self._ts[1:]))
+        self._rebuild_stats()
+    
+    def _read_log(self, max_entries: int) -> deque:
+        """Stream the history log, keeping only the newest max_entries."""
+        # The file may hold more lines than we keep until its next compaction
+        self._log_entries = 0
+        history = deque(maxlen=max_entries)
+        good = 0
+        with open(self.history_file, 'rb') as f:
+            for line in f:
+                # A line without its newline, or one that doesn't parse, was
+                # cut short by a crash during an append; nothing after it counts
+                if not line.endswith(b'\n'):
+                    break
+                if line.strip():
+                    try:
+                        entry = _loads(line)
+                    except ValueError:
+                        break
+                    history.append(entry)
+                    self._log_entries += 1
+                good += len(line)
+        
+        if good < self.history_file.stat().st_size:
+            # Cut the broken tail so the next append starts on a fresh line
+            os.truncate(self.history_file, good)
+        return history
+    
+    def _rebuild_stats(self):
+        """Recompute the running per-day counts and total size."""
+        # Group on the ISO date prefix and only parse each distinct day
+        by_prefix = Counter(e['timestamp'][:10] for e in self.history)
+        self._by_day = Counter({date.fromisoformat(day): n for day, n in by_prefix.items()})
+        self._total_size = sum(e['size'] for e in self.history)
+    
+    def _uncount(self, entries: List[Dict]):
+        """Remove entries dropped from the history from the running stats."""
+        for entry in entries:
+            day = date.fromisoformat(entry['timestamp'][:10])
+            self._by_day[day] -= 1
+            if not self._by_day[day]:
+                del self._by_day[day]
+            self._total_size -= entry['size']
+    
+    def _load_contents(self, live: set):
+        """Index the frames of the content store that live entries refer to."""
+        # contents.bin holds one frame per stored string: a JSON header line,
+        # the UTF-8 text, its lowercased copy for search, and a NUL. The file
+        # is memory-mapped and only headers are parsed, so string text stays
+        # in the page cache until it is displayed or searched.
+        self._mm = None
+        self._contents_size = self.contents_file.stat().st_size if self.contents_file.exists() else 0
+        self._reset_slots()
+        
+        mm = self._map()
+        pos = 0
+        while mm is not None and pos < self._contents_size:
+            newline = mm.find(b'\n', pos)
+            if newline == -1:
+                break
+            try:
+                header = _loads(mm[pos:newline])
+            except ValueError:
+                break
+            raw_start = newline + 1
+            lower_start = raw_start + header['size']
+            end = lower_start + header['lower'] + 1
+            if end > self._contents_size:
+                break
+            if header['hash'] in live:
+                self._register(header['hash'], raw_start, header['size'], lower_start, header['lower'],
+                               header.get('codec'))
+            pos = end
+        
+        if pos < self._contents_size:
+            # Drop a frame cut short by a crash so later appends line up
+            self._close_map()
+            os.truncate(self.contents_file, pos)
+            self._contents_size = pos
+        self._contents_id = self._stat_contents()
+    
+    def _reset_slots(self):
+        """Forget the location of every stored string."""
+        # Per stored string ("slot"): its hash, where its stored text starts,
+        # how long it is and how it is compressed, and the bounds of its
+        # lowercase copy
+        self._by_hash = {}
+        self._slot_hashes = []
+        self._raw_starts = []
+        self._raw_lengths = []
+        self._codecs = []
+        self._lower_starts = []
+        self._lower_ends = []
+    
+    def _map(self) -> Optional[mmap.mmap]:
+        """Return a read-only mapping of the content store, remapped if it grew."""
+        if self._mm is None or len(self._mm) < self._contents_size:
+            self._close_map()
+            if self._contents_size:
+                with open(self.contents_file, 'rb') as f:
+                    self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm
+    
+    def _close_map(self):
+        """Unmap the content store, e.g. before replacing the file."""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+    
+    @contextmanager
+    def _locked(self):
+        """Hold the data directory's lock file; nested uses share one lock."""
+        if self._lock_depth == 0:
+            self._lock = open(self.lock_file, 'a+b')
+            try:
+                if sys.platform == 'win32':
+                    self._lock.seek(0)
+                    msvcrt.locking(self._lock.fileno(), msvcrt.LK_LOCK, 1)
+                else:
+                    fcntl.flock(self._lock.fileno(), fcntl.LOCK_EX)
+            except BaseException:
+                self._lock.close()
+                raise
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0:
+                if sys.platform == 'win32':
+                    # Windows cannot replace or truncate a file another
+                    # process has mapped, so only map it while locked
+                    self._close_map()
+                # Closing the file releases the lock
+                self._lock.close()
+                self._lock = None
+    
+    def _stat_contents(self) -> Optional[Tuple[int, int]]:
+        """Return the inode and size of the content store, or None if missing."""
+        try:
+            st = self.contents_file.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size
+    
+    def _check_contents(self):
+        """Re-index the content store if another process changed it since we did."""
+        with self._locked():
+            current = self._stat_contents()
+            if current != self._contents_id:
+                if (current is not None and self._contents_id is not None and
+                        current[0] == self._contents_id[0] and current[1] > self._contents_id[1]):
+                    # Another process only appended frames; ours have not moved
+                    self._contents_size = current[1]
+                    self._contents_id = current
+                else:
+                    self._reload_contents()
+            # Map while locked so the mapping is of the file just checked
+            self._map()
+    
+    def _reload_contents(self):
+        """Re-index a content store another process has rewritten."""
+        # A compaction elsewhere drops strings that only our entries refer
+        # to. An old mapping, where one is held, still shows the replaced
+        # file, so queue them to be written again.
+        old_mm = self._mm
+        by_hash, raw_starts, raw_lengths, codecs = self._by_hash, self._raw_starts, self._raw_lengths, self._codecs
+        self._mm = None
+        live = {entry['hash'] for entry in self.history}
+        self._load_contents(live)
+        if old_mm is not None:
+            for content_hash in live - self._by_hash.keys() - self._pending_contents.keys():
+                slot = by_hash.get(content_hash)
+                if slot is not None:
+                    data = old_mm[raw_starts[slot]:raw_starts[slot] + raw_lengths[slot]]
+                    self._pending_contents[content_hash] = self._decompress(data, codecs[slot])
+            old_mm.close()
+    
+        # Entries whose string is gone everywhere are skipped, as on load
+        kept = [i for i, entry in enumerate(self.history)
+                if entry['hash'] in self._by_hash or entry['hash'] in self._pending_contents]
+        if len(kept) < len(self.history):
+            self.history = [self.history[i] for i in kept]
+            self._ts = [self._ts[i] for i in kept]
+            self._rebuild_stats()
+    
+    def _register(self, content_hash: str, raw_start: int, raw_length: int,
+                  lower_start: int, lower_length: int, codec: Optional[str] = None):
+        """Record where a stored string's frame lives in the content store."""
+        self._by_hash[content_hash] = len(self._slot_hashes)
+        self._slot_hashes.append(content_hash)
+        self._raw_starts.append(raw_start)
+        self._raw_lengths.append(raw_length)
+        self._codecs.append(codec)
+        self._lower_starts.append(lower_start)
+        self._lower_ends.append(lower_start + lower_length)
+    
+    def _content(self, entry: Dict) -> str:
+        """Return the text of a history entry."""
+        content_hash = entry['hash']
+        if content_hash in self._pending_contents:
+            return self._pending_contents[content_hash]
+        return self._read_content(content_hash)
+    
+    def _decode_content(self, content_hash: str) -> str:
+        """Read and, if needed, decompress a stored string."""
+        slot = self._by_hash[content_hash]
+        start = self._raw_starts[slot]
+        return self._decompress(self._map()[start:start + self._raw_lengths[slot]], self._codecs[slot])
+    
+    def _decompress(self, data: bytes, codec: Optional[str]) -> str:
+        """Turn the stored form of a string back into its text."""
+        if codec == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("History is zstd-compressed; install it with: pip install zstandard")
+            if self._decompressor is None:
+                self._decompressor = zstandard.ZstdDecompressor()
+            data = self._decompressor.decompress(data)
+        return data.decode('utf-8')
+    
+    def _frame_header(self, content_hash: str, raw_length: int, lower_length: int,
+                      codec: Optional[str] = None) -> bytes:
+        """Serialize the header line that starts a content store frame."""
+        header = {'hash': content_hash, 'size': raw_length, 'lower': lower_length}
+        if codec:
+            header['codec'] = codec
+        return _dumps(header) + b'\n'
     
     def save_data(self):
-        """Save clipboard history."""
-        with open(self.history_file, 'w', encoding='utf-8') as f:
-            json.dump(self.history, f, indent=2, ensure_ascii=False)
+        """Rewrite the content store and history log, dropping trimmed entries."""
+        with self._locked():
+            self._check_contents()
+            self._flush_contents()
+            live = {entry['hash'] for entry in self.history}
+            kept = [slot for slot, h in enumerate(self._slot_hashes) if h in live]
+            layout = [(self._slot_hashes[slot], self._raw_lengths[slot],
+                       self._lower_ends[slot] - self._lower_starts[slot], self._codecs[slot])
+                      for slot in kept]
+            headers = [self._frame_header(*frame) for frame in layout]
+            mm = self._map()
+            
+            def frames():
+                for slot, header in zip(kept, headers):
+                    yield header
+                    # Text, lowercase copy and NUL are contiguous in the frame
+                    yield mm[self._raw_starts[slot]:self._lower_ends[slot] + 1]
+            
+            # A crash between the two replaces leaves the old log, whose entries
+            # for dropped strings are skipped on load; those were being removed
+            tmp = _write_temp(self.contents_file, frames())
+            self._close_map()
+            os.replace(tmp, self.contents_file)
+            _atomic_write(self.history_file, b''.join(_dumps(entry) + b'\n' for entry in self.history))
+            self._log_entries = len(self.history)
+            
+            # Slots have moved
+            self._reset_slots()
+            pos = 0
+            for (content_hash, raw_length, lower_length, codec), header in zip(layout, headers):
+                raw_start = pos + len(header)
+                self._register(content_hash, raw_start, raw_length, raw_start + raw_length, lower_length, codec)
+                pos = raw_start + raw_length + lower_length + 1
+            self._contents_size = pos
+            self._contents_id = self._stat_contents()
+            # Keep a mapping of the new file, so that if another process
+            # replaces it in turn our strings can still be read back (not on
+            # Windows, where the mapping is dropped with the lock)
+            self._map()
+        
+        # Everything pending is part of the rewrite
+        self._pending_entries = []
+        self._last_flush = time.monotonic()
+    
+    def _flush_contents(self):
+        """Append frames for pending strings to the content store and fsync it."""
+        if not self._pending_contents:
+            return
+        
+        with self._locked():
+            # Another process may have appended to or rewritten the store since
+            # we last looked, so offsets come from the file, not from memory
+            self._check_contents()
+            # Strings captured again are queued even when already stored
+            missing = [(content_hash, content) for content_hash, content in self._pending_contents.items()
+                       if content_hash not in self._by_hash]
+            if not missing:
+                self._pending_contents.clear()
+                return
+            
+            frames = []
+            slots = []
+            with open(self.contents_file, 'ab') as f:
+                pos = f.tell()
+                for content_hash, content in missing:
+                    raw = content.encode('utf-8')
+                    lower = content.lower().encode('utf-8')
+                    codec = None
+                    # Only keep the compressed form when it is actually smaller;
+                    # short strings such as URLs often are not
+                    if self._compressor is not None:
+                        compressed = self._compressor.compress(raw)
+                        if len(compressed) < len(raw):
+                            raw = compressed
+                            codec = 'zstd'
+                    header = self._frame_header(content_hash, len(raw), len(lower), codec)
+                    frames += (header, raw, lower, b'\x00')
+                    raw_start = pos + len(header)
+                    slots.append((content_hash, raw_start, len(raw), raw_start + len(raw), len(lower), codec))
+                    pos = raw_start + len(raw) + len(lower) + 1
+                
+                f.write(b''.join(frames))
+                f.flush()
+                os.fsync(f.fileno())
+                st = os.fstat(f.fileno())
+            self._contents_size = pos
+            self._contents_id = st.st_ino, st.st_size
+            for slot in slots:
+                self._register(*slot)
+            self._pending_contents.clear()
+            self._map()
+    
+    def _flush(self):
+        """Append pending strings and log lines to disk and fsync them."""
+        with self._locked():
+            # Strings go first so the log never refers to a missing string.
+            # Checking the store re-queues strings another process dropped.
+            self._check_contents()
+            self._flush_contents()
+            if self._pending_entries:
+                with open(self.history_file, 'ab') as f:
+                    f.write(b''.join(self._pending_entries))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._pending_entries.clear()
+        self._last_flush = time.monotonic()
+    
+    def _flush_if_due(self):
+        """Flush once enough entries are pending or they have waited too long."""
+        if not self._pending_entries:
+            return
+        if (len(self._pending_entries) >= self.FLUSH_EVERY or
+                time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL):
+            self._flush()
     
     def save_config(self):
         """Save configuration."""
-        with open(self.config_file, 'w') as f:
-            json.dump(self.config, f, indent=2)
+        _atomic_write(self.config_file, _dumps(self.config, indent=True))
+    
+    def _encode(self, content: str) -> Optional[Tuple[bytes, str]]:
+        """Return the UTF-8 bytes and hash of content, or None if too large."""
+        # Every character takes at least one UTF-8 byte, so oversized
+        # contents are rejected before encoding
+        if len(content) > self.max_size_bytes:
+            return None
+        data = content.encode('utf-8')
+        if len(data) > self.max_size_bytes:
+            return None
+        return data, _content_hash(data)
     
-    def add_entry(self, content: str):
-        """Add entry to history."""
+    def add_entry(self, content: str, encoded: Optional[Tuple[bytes, str]] = None):
+        """Add entry to history; encoded may carry a precomputed _encode(content)."""
+        if encoded is None:
+            encoded = self._encode(content)
         # Skip if too large
-        if len(content.encode('utf-8')) > self.max_size_bytes:
+        if encoded is None:
             return False
+        data, content_hash = encoded
         
         # Skip if same as last entry
-        if self.history and self.history[-1]['content'] == content:
+        if self.history and self.history[-1]['hash'] == content_hash:
             return False
         
+        # Queue the text even if it looks stored; another process may have
+        # compacted it away, and _flush_contents skips what is still there
+        self._pending_contents.setdefault(content_hash, content)
+        
+        now = datetime.now()
         entry = {
-            'content': content,
-            'timestamp': datetime.now().isoformat(),
-            'size': len(content.encode('utf-8'))
+            'hash': content_hash,
+            'timestamp': now.isoformat(),
+            'size': len(data)
         }
         
         self.history.append(entry)
+        if self._ts and now.timestamp() < self._ts[-1]:
+            self._ts_sorted = False
+        self._ts.append(now.timestamp())
+        self._by_day[now.date()] += 1
+        self._total_size += entry['size']
+        self._pending_entries.append(_dumps(entry) + b'\n')
+        self._log_entries += 1
         
-        # Limit history size
+        # Limit history size; the log on disk is only compacted once it
+        # holds twice as many lines as we keep, so trimming is amortized
         max_entries = self.config.get('max_entries', 1000)
         if len(self.history) > max_entries:
+            self._uncount(self.history[:-max_entries])
             self.history = self.history[-max_entries:]
+            self._ts = self._ts[-max_entries:]
+            if self._log_entries > 2 * max_entries:
+                self.save_data()
         
-        self.save_data()
+        self._flush_if_due()
         return True
     
     def monitor(self, interval: float = 1.0):
@@ -96,123 +833,193 @@ class ClipboardManager:
         print(f"History file: {self.history_file}")
         print()
         
-        last_content = None
+        # Compare captures by hash; add_entry needs the same hash anyway
+        last_hash = None
+        watcher = create_watcher()
+        # Read the clipboard once at startup, then only when it may have changed
+        changed = True
+        # Exit cleanly on SIGTERM so pending entries are flushed
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        
+        # Python already block-buffers stdout when it is not a terminal; when
+        # piped, flush it on the same schedule as the history
+        interactive = sys.stdout.isatty()
+        last_output_flush = time.monotonic()
         
         try:
             while True:
                 try:
-                    current_content = pyperclip.paste()
-                    
-                    if current_content and current_content != last_content:
-                        if self.add_entry(current_content):
-                            preview = current_content[:50].replace('\n', ' ')
-                            if len(current_content) > 50:
-                                preview += "..."
-                            print(f"[{datetime.now().strftime('%H:%M:%S')}] Captured: {preview}")
+                    if changed:
+                        current_content = watcher.paste()
                         
-                        last_content = current_content
+                        encoded = self._encode(current_content) if current_content else None
+                        
+                        if encoded and encoded[1] != last_hash:
+                            if self.add_entry(current_content, encoded):
+                                preview = current_content[:50].replace('\n', ' ')
+                                if len(current_content) > 50:
+                                    preview += "..."
+                                sys.stdout.write(f"[{datetime.now().strftime('%H:%M:%S')}] Captured: {preview}\n")
+                            
+                            last_hash = encoded[1]
                     
-                    time.sleep(interval)
+                    changed = watcher.wait(interval)
+                    self._flush_if_due()
+                    if not interactive and time.monotonic() - last_output_flush >= self.FLUSH_INTERVAL:
+                        sys.stdout.flush()
+                        last_output_flush = time.monotonic()
                 except Exception as e:
                     print(f"Error: {e}")
                     time.sleep(interval)
         except KeyboardInterrupt:
             print("\nMonitoring stopped.")
+        finally:
+            watcher.close()
+            self._flush()
+            sys.stdout.flush()
+    
+    def _indexes_since(self, cutoff: float):
+        """Return the indexes of entries captured at or after cutoff, oldest first."""
+        if self._ts_sorted:
+            return range(bisect_left(self._ts, cutoff), len(self._ts))
+        return [i for i, ts in enumerate(self._ts) if ts >= cutoff]
     
     def list_entries(self, limit: Optional[int] = None, days: Optional[int] = None):
         """List clipboard history entries."""
-        entries = self.history.copy()
-        
-        # Filter by days
-        if days:
-            cutoff = datetime.now() - timedelta(days=days)
-            entries = [e for e in entries 
-                      if datetime.fromisoformat(e['timestamp']) >= cutoff]
-        
-        # Reverse to show newest first
-        entries.reverse()
-        
-        # Limit
-        if limit:
-            entries = entries[:limit]
+        # Read under the lock and print afterwards, so a slow terminal or
+        # pager does not hold up other processes
+        with self._locked():
+            self._check_contents()
+            indexes = range(len(self.history))
+            
+            # Filter by days
+            if days:
+                cutoff = (datetime.now() - timedelta(days=days)).timestamp()
+                indexes = self._indexes_since(cutoff)
+            
+            # Walk indexes newest first instead of copying and reversing the list
+            indexes = indexes[::-1]
+            
+            # Limit
+            if limit:
+                indexes = indexes[:limit]
+            
+            previews = []
+            for index in indexes:
+                entry = self.history[index]
+                content = self._content(entry)
+                preview = content[:60].replace('\n', ' ')
+                if len(content) > 60:
+                    preview += "..."
+                previews.append((entry, preview))
         
-        if not entries:
+        if not previews:
             print("No clipboard history entries found.")
             return
         
-        print(f"\nClipboard History ({len(entries)} entries):")
+        print(f"\nClipboard History ({len(previews)} entries):")
         print("=" * 70)
         
-        for i, entry in enumerate(entries, 1):
-            dt = datetime.fromisoformat(entry['timestamp'])
-            content = entry['content']
-            preview = content[:60].replace('\n', ' ')
-            if len(content) > 60:
-                preview += "..."
-            
+        for i, (entry, preview) in enumerate(previews, 1):
+            dt = _display_time(entry['timestamp'])
             size_kb = entry['size'] / 1024
-            print(f"{i}. [{dt.strftime('%Y-%m-%d %H:%M:%S')}] ({size_kb:.1f} KB)")
+            print(f"{i}. [{dt}] ({size_kb:.1f} KB)")
             print(f"   {preview}")
             print()
     
+    def _scan_corpus(self, query_lower: bytes) -> set:
+        """Return the hashes of stored strings containing query_lower."""
+        hits = set()
+        mm = self._map()
+        starts = self._lower_starts
+        ends = self._lower_ends
+        if mm is None or not starts:
+            return hits
+        if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        
+        # One mmap.find pass over the store, skipping to the next lowercase
+        # copy after each hit. Hits in headers, original text, dropped
+        # strings or spanning a NUL land outside the slot's lowercase copy.
+        pos = starts[0]
+        while True:
+            hit = mm.find(query_lower, pos, ends[-1])
+            if hit == -1:
+                break
+            slot = bisect_right(starts, hit) - 1
+            if hit + len(query_lower) <= ends[slot]:
+                hits.add(self._slot_hashes[slot])
+            if slot + 1 == len(starts):
+                break
+            pos = starts[slot + 1]
+        return hits
+    
     def search(self, query: str, limit: Optional[int] = None):
         """Search clipboard history."""
-        query_lower = query.lower()
-        matches = []
+        query_lower = query.lower().encode('utf-8')
+        previews = []
         
-        for entry in reversed(self.history):
-            if query_lower in entry['content'].lower():
-                matches.append(entry)
-                if limit and len(matches) >= limit:
-                    break
+        with self._locked():
+            # Make strings captured in this process searchable
+            self._check_contents()
+            self._flush_contents()
+            
+            hits = self._scan_corpus(query_lower)
+            
+            if hits:
+                for entry in reversed(self.history):
+                    if entry['hash'] in hits:
+                        content = self._content(entry)
+                        preview = content[:80].replace('\n', ' ')
+                        if len(content) > 80:
+                            preview += "..."
+                        previews.append((entry, preview))
+                        if limit and len(previews) >= limit:
+                            break
         
-        if not matches:
+        if not previews:
             print(f"No entries found matching '{query}'")
             return
         
-        print(f"\nFound {len(matches)} matching entries:")
+        print(f"\nFound {len(previews)} matching entries:")
         print("=" * 70)
         
-        for i, entry in enumerate(matches, 1):
-            dt = datetime.fromisoformat(entry['timestamp'])
-            content = entry['content']
-            preview = content[:80].replace('\n', ' ')
-            if len(content) > 80:
-                preview += "..."
-            
-            print(f"{i}. [{dt.strftime('%Y-%m-%d %H:%M:%S')}]")
+        for i, (entry, preview) in enumerate(previews, 1):
+            dt = _display_time(entry['timestamp'])
+            print(f"{i}. [{dt}]")
             print(f"   {preview}")
             print()
     
     def get_entry(self, index: int):
         """Get entry by index (1-based, newest first)."""
-        if not self.history:
-            print("No clipboard history.")
-            return
-        
-        entries = list(reversed(self.history))
-        
-        if index < 1 or index > len(entries):
-            print(f"Invalid index. Range: 1-{len(entries)}")
-            return
-        
-        entry = entries[index - 1]
-        dt = datetime.fromisoformat(entry['timestamp'])
+        with self._locked():
+            self._check_contents()
+            if not self.history:
+                print("No clipboard history.")
+                return
+            
+            if index < 1 or index > len(self.history):
+                print(f"Invalid index. Range: 1-{len(self.history)}")
+                return
+            
+            entry = self.history[-index]
+            content = self._content(entry)
+        dt = _display_time(entry['timestamp'])
         
         print(f"\nEntry #{index}:")
         print("=" * 70)
-        print(f"Timestamp: {dt.strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"Timestamp: {dt}")
         print(f"Size: {entry['size']} bytes")
         print(f"Content:")
         print("-" * 70)
-        print(entry['content'])
+        print(content)
         print("-" * 70)
         
         # Option to copy to clipboard
         try:
             response = input("\nCopy to clipboard? (y/n): ")
             if response.lower() == 'y':
-                pyperclip.copy(entry['content'])
+                pyperclip.copy(content)
                 print("Copied to clipboard!")
         except KeyboardInterrupt:
             pass
@@ -220,20 +1027,24 @@ class ClipboardManager:
     def clear(self, days: Optional[int] = None):
         """Clear clipboard history."""
         if days:
-            cutoff = datetime.now() - timedelta(days=days)
-            original_count = len(self.history)
-            self.history = [e for e in self.history 
-                          if datetime.fromisoformat(e['timestamp']) >= cutoff]
-            removed = original_count - len(self.history)
+            cutoff = (datetime.now() - timedelta(days=days)).timestamp()
+            kept = self._indexes_since(cutoff)
+            removed = len(self.history) - len(kept)
+            self.history = [self.history[i] for i in kept]
+            self._ts = [self._ts[i] for i in kept]
+            self._ts_sorted = all(a <= b for a, b in zip(self._ts, self._ts[1:]))
             print(f"Removed {removed} entries older than {days} days.")
         else:
             response = input("Clear all clipboard history? (yes/no): ")
             if response.lower() == 'yes':
                 self.history = []
+                self._ts = []
+                self._ts_sorted = True
                 print("Clipboard history cleared.")
             else:
                 print("Cancelled.")
         
+        self._rebuild_stats()
         self.save_data()
     
     def stats(self):
@@ -243,14 +1054,11 @@ class ClipboardManager:
             return
         
         total_entries = len(self.history)
-        total_size = sum(e['size'] for e in self.history)
+        total_size = self._total_size
         avg_size = total_size / total_entries if total_entries > 0 else 0
         
-        # Entries by day
-        by_day = {}
-        for entry in self.history:
-            date = datetime.fromisoformat(entry['timestamp']).date()
-            by_day[date] = by_day.get(date, 0) + 1
+        # Entries by day, maintained incrementally by add_entry and clear
+        by_day = self._by_day
         
         print("\nClipboard History Statistics:")
         print("=" * 70)
@@ -259,8 +1067,8 @@ class ClipboardManager:
         print(f"Average Entry Size: {avg_size:.0f} bytes")
         print(f"Days with Activity: {len(by_day)}")
         print(f"\nMost Active Days:")
-        for date, count in sorted(by_day.items(), key=lambda x: x[1], reverse=True)[:5]:
-            print(f"  {date}: {count} entries")
+        for day, count in heapq.nlargest(5, by_day.items(), key=itemgetter(1)):
+            print(f"  {day}: {count} entries")
 
 
 def main():
@@ -0,0 +1,118 @@
+"""Tests for the on-disk history log and content store."""
+
+import atexit
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import clipboard_manager  # noqa: E402
+
+
+class StorageTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.data_dir = self._tmp.name
+        with open(os.path.join(self.data_dir, 'config.json'), 'w') as f:
+            json.dump({'max_entries': 100, 'retention_days': 30}, f)
+        self._managers = []
+
+    def tearDown(self):
+        for manager in self._managers:
+            manager._close_map()
+        self._tmp.cleanup()
+
+    def manager(self):
+        """Open the data directory the way a separate process would."""
+        manager = clipboard_manager.ClipboardManager(self.data_dir)
+        # Flushing at interpreter exit would write into a deleted directory
+        atexit.unregister(manager._flush)
+        self._managers.append(manager)
+        return manager
+
+    def contents(self, manager):
+        return [manager._content(entry) for entry in manager.history]
+
+
+class TestReload(StorageTestCase):
+    def test_roundtrip(self):
+        a = self.manager()
+        for text in ['one', 'Two', 'one', 'x' * 5000]:
+            a.add_entry(text)
+        a._flush()
+        self.assertEqual(self.contents(self.manager()), ['one', 'Two', 'one', 'x' * 5000])
+
+    def test_partial_log_line_is_dropped(self):
+        a = self.manager()
+        a.add_entry('kept')
+        a._flush()
+        with open(a.history_file, 'ab') as f:
+            f.write(b'{"hash":"ab')
+        b = self.manager()
+        self.assertEqual(self.contents(b), ['kept'])
+        # The next append starts on a fresh line
+        b.add_entry('after')
+        b._flush()
+        self.assertEqual(self.contents(self.manager()), ['kept', 'after'])
+
+    def test_partial_frame_is_truncated(self):
+        a = self.manager()
+        a.add_entry('kept')
+        a._flush()
+        size = a.contents_file.stat().st_size
+        with open(a.contents_file, 'ab') as f:
+            f.write(b'{"hash":"00","size":10,"lower":10}\nabc')
+        b = self.manager()
+        self.assertEqual(b.contents_file.stat().st_size, size)
+        self.assertEqual(self.contents(b), ['kept'])
+
+
+class TestSharedDirectory(StorageTestCase):
+    def test_recapture_after_other_process_clears(self):
+        a = self.manager()
+        a.add_entry('secret-url')
+        a.add_entry('other')
+        a._flush()
+
+        b = self.manager()
+        with mock.patch('builtins.input', return_value='yes'), mock.patch('sys.stdout'):
+            b.clear()
+
+        # A still believes the string is stored and captures it again
+        a.add_entry('secret-url')
+        a._flush()
+        self.assertEqual(self.contents(self.manager())[-1], 'secret-url')
+
+    def test_append_after_other_process_compacts(self):
+        a = self.manager()
+        for i in range(25):
+            a.add_entry(f'entry {i}')
+        a._flush()
+
+        b = self.manager()
+        b.history = b.history[-3:]
+        b._ts = b._ts[-3:]
+        b.save_data()
+
+        for i in range(25, 30):
+            a.add_entry(f'entry {i}')
+        a._flush()
+        self.assertEqual(a._scan_corpus(b'entry 1'), {entry['hash'] for entry in a.history
+                                                      if a._content(entry).startswith('entry 1')})
+        # Strings B dropped are read back from A's old mapping where it has
+        # one; either way A's own view and the files have to agree
+        held = self.contents(a)
+        self.assertEqual(held[-8:], [f'entry {i}' for i in range(22, 30)])
+        if sys.platform != 'win32':
+            self.assertEqual(held, [f'entry {i}' for i in range(30)])
+        a.save_data()
+        self.assertEqual(self.contents(self.manager()), held)
+
+
+if __name__ == '__main__':
+    unittest.main()